@@ -1,14 +1,19 @@
 # scripts/update_data.py
 # -*- coding: utf-8 -*-
 
+import asyncio
+import hashlib
 import json
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import orjson
+from selectolax.lexbor import LexborHTMLParser
 
 import fitz  # PyMuPDF
 
@@ -47,168 +52,381 @@ BAD_KEYWORDS = [
 ]
 SOFT_BAD_KEYWORDS = ["约会", "情侣"]
 
+# 各信息源的固定标签：模块级元组，所有条目共享同一个对象（只读，orjson 照常写成数组）
+TAGS_WGLJ_ENTRY = ("官方资讯", "活动清单")
+TAGS_GDMUSEUM = ("官方场馆", "粤博", "室内")
+TAGS_GZMUSEUM = ("官方场馆", "博物馆", "展览", "室内")
+
+
+# ===== 预编译正则（热路径上别每次走 re 模块缓存）=====
+# 关键词合并成一条交替式：每个标题/文本块只扫一遍（C 级），
+# 不再对每个关键词各跑一次 Python 的 `in`
+_RE_BAD = re.compile("|".join(map(re.escape, BAD_KEYWORDS)))
+_RE_SOFT_BAD = re.compile("|".join(map(re.escape, SOFT_BAD_KEYWORDS)))
+_RE_TAGS = re.compile(
+    "(?P<exhibit>展览|展)|(?P<music>音乐会|演唱|音乐)|(?P<drama>戏剧|话剧|舞台)|"
+    "(?P<kids>亲子|儿童)|(?P<flower>花期|赏花|樱|梅|荷|红叶)"
+)
+_TAG_LABELS = {"exhibit": "展览", "music": "音乐", "drama": "戏剧", "kids": "亲子", "flower": "看花"}
+_RE_TIME = re.compile(r"(\d{1,2}:\d{2})\s*[-~—–]\s*(\d{1,2}:\d{2})")
+_RE_LOC = re.compile(r"(地点|地址|场馆)[:：]\s*([^。；;]{4,40})")
+_RE_EVENT_ID = re.compile(r"/event/\d+")
+# PDF 文本按日期锚点切块：一次 finditer 扫全文，代替逐行攒 buf
+_RE_PDF_BLOCK = re.compile(
+    r"(?P<date>(?<![\d:：])(?:\d{4}年)?\d{1,2}\s*[月/.\-]\s*\d{1,2}\s*日?)"
+    r"(?P<body>.{0,400}?)"
+    r"(?=(?<![\d:：])(?:\d{4}年)?\d{1,2}\s*[月/.\-]\s*\d{1,2}\s*日?|\Z)",
+    re.DOTALL,
+)
+
 
 def now_cn_iso() -> str:
     return datetime.now(TZ_CN).isoformat(timespec="seconds")
 
 
 def norm(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "").strip())
+    # split()/join 都是 C 实现：任意空白串折叠成单空格，首尾也顺带去掉
+    return " ".join(s.split()) if s else ""
 
 
 def looks_bad(title: str) -> bool:
     t = norm(title)
-    if any(k in t for k in BAD_KEYWORDS):
-        # 软词不做强过滤（防误杀）
-        if any(k in t for k in SOFT_BAD_KEYWORDS) and not any(k in t for k in BAD_KEYWORDS):
-            return False
-        return True
-    return False
+    if _RE_BAD.search(t) is None:
+        return False
+    # 软词不做强过滤（防误杀）：原实现的这个分支永远走不到，现在真正生效
+    return _RE_SOFT_BAD.search(t) is None
+
+
+# 并发上限：别把人家网站打挂（也避免被封）
+_FETCH_SEM = asyncio.Semaphore(20)
+# 豆瓣单独再压一道：同时最多 4 个请求，降低被风控的概率
+_DOUBAN_SEM = asyncio.Semaphore(4)
+
+# 重试策略：这些状态码（以及断连/超时）值得再试，其余直接抛
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_RETRY_TOTAL = 3
+_RETRY_BACKOFF = 0.5  # 秒；每次翻倍
+
+# ===== 磁盘缓存（条件请求）=====
+# 大部分页面/PDF 每天基本不变；存下 ETag / Last-Modified，
+# 下次带条件请求，命中 304 就直接用本地 body，省掉绝大多数下载。
+CACHE_DIR = ".scrape_cache"
+
+# TTL 内直接用本地副本、连条件请求都不发（CACHE_HTTP=0 可关掉，强制每次都走网络验证）
+HTML_TTL = timedelta(hours=6)
+PDF_TTL = timedelta(days=7)  # 官方 PDF 极少改
+_TTL_ENABLED = os.environ.get("CACHE_HTTP", "1") != "0"
+
+
+def _cache_fresh(meta: Dict[str, Any], ttl: timedelta) -> bool:
+    try:
+        fetched_at = datetime.fromisoformat(meta["fetched_at"])
+        return datetime.now(TZ_CN) - fetched_at < ttl
+    except Exception:
+        return False
+
+
+def _cache_paths(url: str) -> Tuple[str, str]:
+    key = hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+    return (os.path.join(CACHE_DIR, key + ".meta.json"),
+            os.path.join(CACHE_DIR, key + ".body"))
+
+
+def _cache_load(url: str) -> Tuple[Dict[str, Any], bytes]:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except Exception:
+        return {}, b""
 
 
-def http_get(url: str, timeout: int = 25) -> str:
-    r = requests.get(url, headers=HEADERS, timeout=timeout)
-    r.raise_for_status()
-    return r.text
+def _cache_store(url: str, meta: Dict[str, Any], body: bytes) -> None:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(body_path, "wb") as f:
+            f.write(body)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"[cache] store failed {url}: {e}")
 
 
-def http_get_bytes(url: str, timeout: int = 35) -> bytes:
-    r = requests.get(url, headers=HEADERS, timeout=timeout)
-    r.raise_for_status()
-    return r.content
+def _cache_refresh(url: str, meta: Dict[str, Any], headers: Any) -> None:
+    """
+    验证通过（304 / body 没变）后只重写 meta：续上 TTL 窗口，
+    顺带吸收响应里可能更新过的 ETag / Last-Modified。body 原样保留。
+    """
+    meta = dict(meta)
+    if headers.get("ETag"):
+        meta["etag"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        meta["last_modified"] = headers["Last-Modified"]
+    meta["fetched_at"] = now_cn_iso()
+    meta_path, _ = _cache_paths(url)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"[cache] refresh failed {url}: {e}")
 
 
-def extract_pdf_text(pdf_bytes: bytes, max_pages: int = 12) -> str:
+async def _fetch(session: aiohttp.ClientSession, url: str, timeout: int,
+                 max_bytes: int = 0, ttl: timedelta = None,
+                 require_pdf: bool = False) -> Tuple[bytes, str, bool]:
     """
-    从 PDF 提取文本（优先文本层，不做 OCR）。
+    带条件请求的抓取：返回 (body, charset, unchanged)。
+    TTL 未过期直接回放缓存（零网络）；之后 304 回放缓存；
+    没有 ETag/Last-Modified 的站点退化为比对 body 的 SHA256，
+    内容没变时 unchanged=True，下游可以跳过重新解析。
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    meta, cached = _cache_load(url)
+    if cached and ttl and _TTL_ENABLED and _cache_fresh(meta, ttl):
+        return cached, meta.get("charset") or "utf-8", True
+    cond_headers = {}
+    if cached:
+        if meta.get("etag"):
+            cond_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            cond_headers["If-Modified-Since"] = meta["last_modified"]
+
+    async def _once() -> Tuple[bytes, str, bool]:
+        async with _FETCH_SEM:
+            async with session.get(url, headers=cond_headers,
+                                   timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                if r.status == 304 and cached:
+                    _cache_refresh(url, meta, r.headers)
+                    return cached, meta.get("charset") or "utf-8", True
+                r.raise_for_status()
+
+                # 说好要 PDF 结果给的是 HTML（报错页/下载跳转页），头部看一眼就撤，
+                # 正文一个字节都不用读
+                if require_pdf:
+                    ct = (r.headers.get("Content-Type") or "").lower()
+                    if "pdf" not in ct and not url.lower().split("?")[0].endswith(".pdf"):
+                        return b"", "utf-8", False
+
+                # 流式读 + 上限截断，别把几十 MB 的扫描件整个吞进内存
+                buf = bytearray()
+                async for chunk in r.content.iter_chunked(65536):
+                    buf += chunk
+                    if max_bytes and len(buf) > max_bytes:
+                        raise ValueError(f"response too large (>{max_bytes} bytes): {url}")
+                body = bytes(buf)
+
+                body_sha = hashlib.sha256(body).hexdigest()
+                unchanged = bool(cached) and meta.get("body_sha") == body_sha
+                if unchanged:
+                    # body 没变也要续 TTL，不然稳定不变的 URL 反而每轮都得重新验证
+                    _cache_refresh(url, meta, r.headers)
+                else:
+                    _cache_store(url, {
+                        "url": url,
+                        "etag": r.headers.get("ETag", ""),
+                        "last_modified": r.headers.get("Last-Modified", ""),
+                        "charset": r.charset or "utf-8",
+                        "body_sha": body_sha,
+                        "fetched_at": now_cn_iso(),
+                    }, body)
+                return body, r.charset or "utf-8", unchanged
+
+    # 瞬时故障（429/5xx/断连/超时）指数退避重试，稳定性问题别传染给整轮抓取
+    for attempt in range(_RETRY_TOTAL):
+        try:
+            return await _once()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = getattr(e, "status", None)
+            if attempt == _RETRY_TOTAL - 1 or (status is not None and status not in _RETRY_STATUSES):
+                raise
+            await asyncio.sleep(_RETRY_BACKOFF * (2 ** attempt))
+    raise RuntimeError("unreachable")
+
+
+# ===== 解析结果缓存 =====
+# 内容（按 SHA256）没变就直接复用上次的解析结果：豆瓣列表页省掉建 DOM，
+# PDF 省掉整个 MuPDF 提取 + 拆条目。只保留本次运行还用得上的键，缓存不会越滚越大。
+_PARSED_LINKS_PATH = os.path.join(CACHE_DIR, "parsed_links.json")
+_PDF_EVENTS_PATH = os.path.join(CACHE_DIR, "pdf_events.json")
+_parsed_links: Dict[str, Any] = {}
+_parsed_links_touched: set = set()
+_pdf_events: Dict[str, Any] = {}
+_pdf_events_touched: set = set()
+
+
+def _memo_load(path: str) -> Dict[str, Any]:
     try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _memo_save(path: str, memo: Dict[str, Any], touched: set) -> None:
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({k: memo[k] for k in touched}, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"[cache] memo save failed {path}: {e}")
+
+
+def _memos_load() -> None:
+    global _parsed_links, _pdf_events
+    _parsed_links = _memo_load(_PARSED_LINKS_PATH)
+    _pdf_events = _memo_load(_PDF_EVENTS_PATH)
+
+
+def _memos_save() -> None:
+    _memo_save(_PARSED_LINKS_PATH, _parsed_links, _parsed_links_touched)
+    _memo_save(_PDF_EVENTS_PATH, _pdf_events, _pdf_events_touched)
+
+
+async def http_get(session: aiohttp.ClientSession, url: str, timeout: int = 25) -> str:
+    body, charset, _ = await _fetch(session, url, timeout, ttl=HTML_TTL)
+    return body.decode(charset, errors="replace")
+
+
+# PDF 下载上限：超过这个就当异常文件跳过（政务公告 PDF 正常不会这么大）
+MAX_PDF_BYTES = 8_000_000
+
+
+async def http_get_bytes(session: aiohttp.ClientSession, url: str, timeout: int = 35,
+                         max_bytes: int = MAX_PDF_BYTES) -> bytes:
+    body, _, _ = await _fetch(session, url, timeout, max_bytes=max_bytes, ttl=PDF_TTL,
+                              require_pdf=True)
+    return body
+
+
+def extract_pdf_text(pdf_bytes: bytes, max_pages: int = 6) -> str:
+    """
+    从 PDF 提取文本（优先文本层，不做 OCR）。
+    排期类 PDF 有用的内容都在前几页，默认只看 6 页。
+    """
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
         texts = []
-        pages = min(len(doc), max_pages)
-        for i in range(pages):
-            page = doc.load_page(i)
-            t = page.get_text("text") or ""
+        # 直接迭代 doc，比逐个 load_page 少一轮查表；页码到上限即停
+        for i, page in enumerate(doc):
+            if i >= max_pages:
+                break
+            # 显式建一次 TextPage（只要文本层，跳过图片解码），
+            # 比 get_text 每次在内部重建省一轮分配
+            tp = page.get_textpage(flags=fitz.TEXT_PRESERVE_WHITESPACE)
+            t = tp.extractText() or ""
+            tp = None
+            # 几乎没字又满是图 → 扫描页，跳过（OCR 不在本脚本范围内）
+            skip = len(t) < 40 and bool(page.get_images(full=False))
+            # 提前松开页面引用，让底层资源随遍历及时回收
+            page = None
+            if skip:
+                continue
             texts.append(t)
         return "\n".join(texts)
-    finally:
-        doc.close()
 
 
-def find_pdf_links_in_page(page_url: str) -> List[str]:
+async def find_pdf_links_in_page(session: aiohttp.ClientSession, page_url: str) -> List[str]:
     """
     打开文旅局页面，找出 PDF 附件链接（宽松匹配）。
     """
-    html = http_get(page_url)
-    soup = BeautifulSoup(html, "html.parser")
+    html = await http_get(session, page_url)
+    tree = LexborHTMLParser(html)
     pdfs: List[str] = []
 
-    for a in soup.select("a"):
-        href = (a.get("href") or "").strip()
+    # 属性选择器区分大小写，政府站常见 FOO.PDF / Download.aspx 这类写法，
+    # 所以只用选择器筛出带 href 的 <a>，再回 Python 做小写子串粗筛
+    for a in tree.css("a[href]"):
+        href = (a.attributes.get("href") or "").strip()
         if not href:
             continue
-
         low = href.lower()
-        if low.endswith(".pdf") or ".pdf?" in low:
-            pdfs.append(urljoin(page_url, href))
-            continue
-
-        # 一些附件链接可能不是以 .pdf 结尾（例如下载接口），先收集
-        if any(x in low for x in ["download", "attach", "file", "附件"]):
+        if (
+            low.endswith(".pdf")
+            or ".pdf?" in low
+            or "download" in low
+            or "attach" in low
+            or "file" in low
+            or "附件" in href
+        ):
             pdfs.append(urljoin(page_url, href))
 
-    # 去重
-    seen = set()
-    out: List[str] = []
-    for u in pdfs:
-        if u in seen:
-            continue
-        seen.add(u)
-        out.append(u)
-    return out
+    # 去重（保序）
+    return list(dict.fromkeys(pdfs))
+
+
+# 所有条目共用的缺省模板（和你前端 schema 对齐）。
+# weatherFit/seasonFit 共享同一个常量对象：调用方只读、序列化时按值写出，共享安全。
+_ALL_WEATHER = {"rain": True, "sun": True, "cold": True}
+_ALL_SEASONS = {"spring": True, "summer": True, "autumn": True, "winter": True}
+_DEFAULT_ITEM: Dict[str, Any] = {
+    "type": "event",
+    "name": "",
+    "area": "广州",
+    "date": "",
+    "timeHint": "",
+    "cost": "mid",
+    "reservation": "maybe",
+    "tags": [],
+    "transitEase": 3,
+    "transferComplexity": 3,
+    "timeMin": 80,
+    "intensity": "low",
+    "crowdRisk": 3,
+    "checkin": 2,
+    "weatherFit": _ALL_WEATHER,
+    "seasonFit": _ALL_SEASONS,
+    "mosquito": 1,
+    "toiletSupply": 3,
+    "lighting": 4,
+    "openHoursHint": "以官方公告/详情页为准",
+    "notes": "",
+    "link": "",
+    "source": "unknown",
+}
 
 
 def make_item(**kw) -> Dict[str, Any]:
     """
-    给缺省字段补齐（和你前端 schema 对齐）
+    给缺省字段补齐：一次 C 级 dict 合并，代替 25 个 kw.get
     """
-    base = {
-        "type": kw.get("type", "event"),
-        "name": kw.get("name", ""),
-        "area": kw.get("area", "广州"),
-        "date": kw.get("date", ""),
-        "timeHint": kw.get("timeHint", ""),
-        "cost": kw.get("cost", "mid"),
-        "reservation": kw.get("reservation", "maybe"),
-        "tags": kw.get("tags", []),
-        "transitEase": kw.get("transitEase", 3),
-        "transferComplexity": kw.get("transferComplexity", 3),
-        "timeMin": kw.get("timeMin", 80),
-        "intensity": kw.get("intensity", "low"),
-        "crowdRisk": kw.get("crowdRisk", 3),
-        "checkin": kw.get("checkin", 2),
-        "weatherFit": kw.get("weatherFit", {"rain": True, "sun": True, "cold": True}),
-        "seasonFit": kw.get("seasonFit", {"spring": True, "summer": True, "autumn": True, "winter": True}),
-        "mosquito": kw.get("mosquito", 1),
-        "toiletSupply": kw.get("toiletSupply", 3),
-        "lighting": kw.get("lighting", 4),
-        "openHoursHint": kw.get("openHoursHint", "以官方公告/详情页为准"),
-        "notes": kw.get("notes", ""),
-        "link": kw.get("link", ""),
-        "source": kw.get("source", "unknown"),
-    }
-    return base
+    return {**_DEFAULT_ITEM, **kw}
 
 
 def split_events_from_pdf_text(pdf_text: str, source_pdf: str) -> List[Dict[str, Any]]:
     """
     把 PDF 文本“粗拆”成活动条目。先求可用：让你不用下载也能在网页里看到关键信息。
     """
-    lines = [norm(x) for x in pdf_text.splitlines()]
-    lines = [x for x in lines if x and len(x) >= 4]
-
-    date_pat = re.compile(r"(\d{4}年)?\s*\d{1,2}\s*[月/.\-]\s*\d{1,2}\s*(日)?")
-    time_pat = re.compile(r"(\d{1,2}:\d{2})\s*[-~—–]\s*(\d{1,2}:\d{2})")
-
     events: List[Dict[str, Any]] = []
-    buf: List[str] = []
 
-    def flush_buf(buf_lines: List[str]) -> None:
-        if not buf_lines:
-            return
-        block = " ".join(buf_lines)
+    # 一次 C 级 finditer 按日期锚点切块，不再逐行 norm + 攒 buf
+    for m in _RE_PDF_BLOCK.finditer(pdf_text):
+        block = norm(m.group(0))
         if len(block) < 16:
-            return
-
-        m_time = time_pat.search(block)
-        time_hint = m_time.group(0) if m_time else ""
-
-        m_date = date_pat.search(block)
-        date_hint = m_date.group(0) if m_date else ""
-
-        area = "广州（见PDF）"
-        m_loc = re.search(r"(地点|地址|场馆)[:：]\s*([^。；;]{4,40})", block)
-        if m_loc:
-            area = norm(m_loc.group(2))
+            continue
 
+        # 便宜的闸门放前面：名字不过关的块，后面几条正则就都省了
         name = norm(block[:40])
         if "：" in block[:30]:
             name = norm(block.split("：", 1)[1][:40])
 
         if looks_bad(name):
-            return
+            continue
+
+        date_hint = m.group("date")
+
+        m_time = _RE_TIME.search(block)
+        time_hint = m_time.group(0) if m_time else ""
+
+        area = "广州（见PDF）"
+        m_loc = _RE_LOC.search(block)
+        if m_loc:
+            area = norm(m_loc.group(2))
 
         tags = ["官方清单", "PDF解析"]
-        if any(k in block for k in ["展览", "展"]):
-            tags.append("展览")
-        if any(k in block for k in ["音乐会", "演唱", "音乐"]):
-            tags.append("音乐")
-        if any(k in block for k in ["戏剧", "话剧", "舞台"]):
-            tags.append("戏剧")
-        if any(k in block for k in ["亲子", "儿童"]):
-            tags.append("亲子")
-        if any(k in block for k in ["花期", "赏花", "樱", "梅", "荷", "红叶"]):
-            tags.append("看花")
+        hit_groups = {t.lastgroup for t in _RE_TAGS.finditer(block)}
+        tags += [label for group, label in _TAG_LABELS.items() if group in hit_groups]
 
         events.append(make_item(
             type="event",
@@ -228,42 +446,42 @@ def split_events_from_pdf_text(pdf_text: str, source_pdf: str) -> List[Dict[str,
             source="wglj.gz.gov.cn/pdf"
         ))
 
-    for ln in lines:
-        if date_pat.search(ln):
-            flush_buf(buf)
-            buf = [ln]
-        else:
-            if buf:
-                buf.append(ln)
-            else:
-                if len(ln) > 10:
-                    buf = [ln]
-
-        # 控制块长度，避免把太多行合并成一个活动
-        if len(buf) >= 6:
-            flush_buf(buf)
-            buf = []
-
-    flush_buf(buf)
     return events
 
 
 # ---------- 1) 文旅局活动排期索引：入口页 + PDF 解析 ----------
-def parse_wglj_schedule_index(limit: int = 25) -> List[Dict[str, Any]]:
+async def parse_wglj_schedule_index(session: aiohttp.ClientSession, pool: ProcessPoolExecutor,
+                                    limit: int = 25) -> List[Dict[str, Any]]:
     items: List[Dict[str, Any]] = []
+    tpl_entry = make_item(
+        type="event",
+        area="广州（全市）",
+        cost="low",
+        reservation="maybe",
+        tags=TAGS_WGLJ_ENTRY,
+        transitEase=3, transferComplexity=3, timeMin=75,
+        intensity="low",
+        crowdRisk=3, checkin=1,
+        openHoursHint="打开来源页查看附件/具体活动（PDF）",
+        notes="来自广州市文旅局活动排期索引。",
+        source="wglj.gz.gov.cn/hdpq",
+    )
     try:
-        html = http_get(WGLJ_SCHEDULE_INDEX)
-        soup = BeautifulSoup(html, "html.parser")
+        html = await http_get(session, WGLJ_SCHEDULE_INDEX)
+        tree = LexborHTMLParser(html)
 
-        anchors = soup.select("a")
+        # 先试列表容器（省得遍历导航/页脚），选不到再退回全页 <a>
+        anchors = tree.css("ul.list li a, .list a, .news-list a") or tree.css("a")
         for a in anchors:
-            title = norm(a.get_text())
-            href = (a.get("href") or "").strip()
+            title = norm(a.text())
+            href = (a.attributes.get("href") or "").strip()
 
             if not title or not href:
                 continue
             if "活动" not in title and "排期" not in title and "精选" not in title:
                 continue
+            if looks_bad(title):
+                continue
 
             if href.startswith("/"):
                 href = "https://wglj.gz.gov.cn" + href
@@ -271,39 +489,43 @@ def parse_wglj_schedule_index(limit: int = 25) -> List[Dict[str, Any]]:
                 continue
 
             # (A) 入口页保留一条（兜底：就算 PDF 解析挂了也能点进去）
-            items.append(make_item(
-                type="event",
-                name=title,
-                area="广州（全市）",
-                cost="low",
-                reservation="maybe",
-                tags=["官方资讯", "活动清单"],
-                transitEase=3, transferComplexity=3, timeMin=75,
-                intensity="low",
-                crowdRisk=3, checkin=1,
-                openHoursHint="打开来源页查看附件/具体活动（PDF）",
-                notes="来自广州市文旅局活动排期索引。",
-                link=href,
-                source="wglj.gz.gov.cn/hdpq"
-            ))
+            items.append({**tpl_entry, "name": title, "link": href})
 
             # (B) 进入入口页：找 PDF → 下载 → 解析 → 拆条目
             pdf_links: List[str] = []
             try:
-                pdf_links = find_pdf_links_in_page(href)
+                pdf_links = await find_pdf_links_in_page(session, href)
             except Exception as e_find:
                 print(f"[WGLJ page->pdf] failed to find pdfs {href}: {e_find}")
 
             for pdf_url in pdf_links[:3]:  # 每个入口页最多解析 3 个 PDF，避免过慢
                 try:
-                    pdf_bytes = http_get_bytes(pdf_url)
-                    text = extract_pdf_text(pdf_bytes, max_pages=12)
-
-                    # 扫描版/图片版 PDF 会提不到字，先跳过（需要 OCR 才能做）
-                    if len(norm(text)) < 80:
+                    pdf_bytes = await http_get_bytes(session, pdf_url)
+                    # download/attach 宽松匹配会混进 HTML 404 页、压缩包之类，
+                    # 看魔数不是 %PDF- 就不劳驾 MuPDF 了（超大文件在下载层已截断）
+                    if not pdf_bytes.startswith(b"%PDF-"):
                         continue
 
-                    events = split_events_from_pdf_text(text, source_pdf=pdf_url)
+                    # 同一份 PDF（按内容 hash）上次拆过就直接复用，连 MuPDF 都不用开
+                    pdf_sha = hashlib.sha256(pdf_bytes).hexdigest()
+                    events = _pdf_events.get(pdf_sha)
+                    if events is None:
+                        if len(pdf_bytes) < 200_000:
+                            # 小文件直接就地解，省去把字节序列化给子进程的开销
+                            text = extract_pdf_text(pdf_bytes)
+                        else:
+                            # MuPDF 提取是 CPU 活，丢进进程池，几个 PDF 可以同时解
+                            text = await asyncio.get_running_loop().run_in_executor(
+                                pool, extract_pdf_text, pdf_bytes)
+
+                        # 扫描版/图片版 PDF 会提不到字（需要 OCR 才能做）；
+                        # 记一个空结果，下次也不用再试
+                        if len(norm(text)) < 80:
+                            events = []
+                        else:
+                            events = split_events_from_pdf_text(text, source_pdf=pdf_url)
+                        _pdf_events[pdf_sha] = events
+                    _pdf_events_touched.add(pdf_sha)
                     if events:
                         items.extend(events)
 
@@ -320,75 +542,139 @@ def parse_wglj_schedule_index(limit: int = 25) -> List[Dict[str, Any]]:
 
 
 # ---------- 2) 豆瓣同城：分类页 + 分页 ----------
-def extract_douban_event_links(list_html: str) -> List[Tuple[str, str]]:
-    soup = BeautifulSoup(list_html, "html.parser")
-    pairs: List[Tuple[str, str]] = []
-
-    for a in soup.select("a"):
-        href = a.get("href") or ""
-        text = norm(a.get_text())
+def _card_field(a, selector: str) -> str:
+    """
+    从活动链接所在的卡片里找相邻字段（往上最多找 3 层父节点）。
+    到 li 卡片为止、绝不进入 ul/ol 列表容器，免得匹配到别的卡片的字段。
+    """
+    node = a.parent
+    for _ in range(3):
+        if node is None or node.tag in ("ul", "ol"):
+            break
+        hit = node.css_first(selector)
+        if hit is not None:
+            return norm(hit.text())
+        if node.tag == "li":
+            break
+        node = node.parent
+    return ""
+
+
+def extract_douban_event_links(list_html: str) -> List[Dict[str, str]]:
+    tree = LexborHTMLParser(list_html)
+    # dict 保序去重，省掉中间 pairs 列表和第二遍循环
+    uniq: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+    # 只取活动详情链接，跳过导航/页脚的无关 <a>
+    for a in tree.css('a[href*="/event/"]'):
+        href = a.attributes.get("href") or ""
+        text = norm(a.text())
         if not text:
             continue
-        if "douban.com/event/" in href or re.search(r"/event/\d+", href):
-            pairs.append((text, href))
-
-    seen = set()
-    uniq: List[Tuple[str, str]] = []
-    for t, h in pairs:
-        key = (t, h)
-        if key in seen:
+        if "douban.com/event/" not in href and not _RE_EVENT_ID.search(href):
+            continue
+        key = (text, href)
+        if key in uniq:
             continue
-        seen.add(key)
-        uniq.append((t, h))
-    return uniq
+        # 列表卡片上自带时间/地点，就不用再为每个活动多打一次详情页了
+        time_hint = _card_field(a, ".event-time, time, [itemprop='startDate']")
+        addr = _card_field(a, ".event-addr, .event-address, address")
+        uniq[key] = {
+            "title": text,
+            "href": href,
+            "time": time_hint.replace("时间：", "").replace("时间:", "").strip(),
+            "addr": addr.replace("地点：", "").replace("地点:", "").strip(),
+        }
 
+    return list(uniq.values())
 
-def parse_douban_list(category_name: str, base_url: str, pages: int = 8, page_step: int = 10) -> List[Dict[str, Any]]:
+
+async def parse_douban_list(session: aiohttp.ClientSession, category_name: str, base_url: str,
+                            pages: int = 8, page_step: int = 10) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
-    for i in range(pages):
-        start = i * page_step
-        url = base_url if start == 0 else f"{base_url}?start={start}"
-        try:
-            html = http_get(url)
-        except Exception as e:
-            print(f"[Douban list] failed {url}: {e}")
+    # 分页 URL 先整批摊开，调度器一眼看到全部任务；再按豆瓣的并发额度去取
+    urls = [base_url if i == 0 else f"{base_url}?start={i * page_step}" for i in range(pages)]
+
+    async def _get(u: str) -> str:
+        async with _DOUBAN_SEM:
+            return await http_get(session, u)
+
+    results = await asyncio.gather(*[_get(u) for u in urls], return_exceptions=True)
+
+    # 整个分类不变的字段只算一次，循环里仅覆盖 name/link 等少数键
+    tpl = make_item(
+        type="event",
+        area="广州（见详情）",
+        timeHint="",
+        cost="mid",
+        reservation="maybe",
+        tags=("同城活动", category_name),
+        transitEase=3, transferComplexity=3, timeMin=85,
+        intensity="low",
+        crowdRisk=3, checkin=2,
+        openHoursHint="以活动详情页为准（可能需购票/预约）",
+        notes="来自豆瓣同城列表，用于补充当周可去的演出/展览/活动。",
+        source=category_name,
+    )
+    for url, html in zip(urls, results):
+        if isinstance(html, BaseException):
+            print(f"[Douban list] failed {url}: {html}")
             continue
 
-        links = extract_douban_event_links(html)
-        for title, href in links:
+        # 内容没变（hash 命中）直接复用上次的解析结果
+        page_sha = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        links = _parsed_links.get(page_sha)
+        if links is None:
+            # 解析是 CPU 活，放工作线程，别堵住事件循环上还在跑的请求
+            links = await asyncio.to_thread(extract_douban_event_links, html)
+            _parsed_links[page_sha] = links
+        _parsed_links_touched.add(page_sha)
+        for rec in links:
+            title, href = rec["title"], rec["href"]
             if looks_bad(title):
                 continue
 
-            out.append(make_item(
-                type="event",
-                name=title,
-                area="广州（见详情）",
-                date="",
-                timeHint="",
-                cost="mid",
-                reservation="maybe",
-                tags=["同城活动", category_name],
-                transitEase=3, transferComplexity=3, timeMin=85,
-                intensity="low",
-                crowdRisk=3, checkin=2,
-                openHoursHint="以活动详情页为准（可能需购票/预约）",
-                notes="来自豆瓣同城列表，用于补充当周可去的演出/展览/活动。",
-                link=href,
-                source=category_name
-            ))
+            out.append({
+                **tpl,
+                "name": title,
+                "area": rec["addr"] or tpl["area"],
+                "date": rec["time"],
+                "link": href,
+            })
     return out
 
 
 # ---------- 3) 广东省博物馆：活动 ----------
-def parse_gdmuseum_activities(limit: int = 25) -> List[Dict[str, Any]]:
+async def parse_gdmuseum_activities(session: aiohttp.ClientSession, limit: int = 25) -> List[Dict[str, Any]]:
     items: List[Dict[str, Any]] = []
 
+    tpl_home = make_item(
+        type="event",
+        area="天河·广东省博物馆",
+        cost="low",
+        reservation="maybe",
+        tags=TAGS_GDMUSEUM,
+        transitEase=3, transferComplexity=3, timeMin=80,
+        intensity="low",
+        crowdRisk=3, checkin=1,
+        weatherFit={"rain": True, "sun": True, "cold": True},
+        openHoursHint="以粤博公告/活动页为准（通常需预约入馆）",
+        notes="官方场馆活动，雨天/暴晒天友好。",
+        source="gdmuseum.com/home",
+    )
+    tpl_list = {
+        **tpl_home,
+        "openHoursHint": "以活动页为准（通常需预约入馆）",
+        "notes": "来自粤博活动列表页。",
+        "source": "gdmuseum.com/col108",
+    }
+
     try:
-        html = http_get(GDMUSEUM_HOME)
-        soup = BeautifulSoup(html, "html.parser")
-        for a in soup.select("a"):
-            title = norm(a.get_text())
-            href = (a.get("href") or "").strip()
+        html = await http_get(session, GDMUSEUM_HOME)
+        tree = LexborHTMLParser(html)
+        for a in tree.css("a"):
+            title = norm(a.text())
+            href = (a.attributes.get("href") or "").strip()
             if not title or not href:
                 continue
             if "活动" not in title and "工坊" not in title and "迎新" not in title:
@@ -400,22 +686,7 @@ def parse_gdmuseum_activities(limit: int = 25) -> List[Dict[str, Any]]:
             if not href.startswith("http"):
                 continue
 
-            items.append(make_item(
-                type="event",
-                name=title,
-                area="天河·广东省博物馆",
-                cost="low",
-                reservation="maybe",
-                tags=["官方场馆", "粤博", "室内"],
-                transitEase=3, transferComplexity=3, timeMin=80,
-                intensity="low",
-                crowdRisk=3, checkin=1,
-                weatherFit={"rain": True, "sun": True, "cold": True},
-                openHoursHint="以粤博公告/活动页为准（通常需预约入馆）",
-                notes="官方场馆活动，雨天/暴晒天友好。",
-                link=href,
-                source="gdmuseum.com/home"
-            ))
+            items.append({**tpl_home, "name": title, "link": href})
             if len(items) >= limit:
                 break
     except Exception as e:
@@ -423,11 +694,13 @@ def parse_gdmuseum_activities(limit: int = 25) -> List[Dict[str, Any]]:
 
     # 活动列表页（补充）
     try:
-        html = http_get(GDMUSEUM_ACTIVITY_LIST)
-        soup = BeautifulSoup(html, "html.parser")
-        for a in soup.select("a"):
-            title = norm(a.get_text())
-            href = (a.get("href") or "").strip()
+        html = await http_get(session, GDMUSEUM_ACTIVITY_LIST)
+        tree = LexborHTMLParser(html)
+        # 列表页同理：优先活动列表容器，兜底全页 <a>
+        anchors = tree.css(".activity-list a, .news-list a, .list a") or tree.css("a")
+        for a in anchors:
+            title = norm(a.text())
+            href = (a.attributes.get("href") or "").strip()
             if not title or not href:
                 continue
             if looks_bad(title):
@@ -439,21 +712,7 @@ def parse_gdmuseum_activities(limit: int = 25) -> List[Dict[str, Any]]:
             if "gdmuseum.com" not in href:
                 continue
 
-            items.append(make_item(
-                type="event",
-                name=title,
-                area="天河·广东省博物馆",
-                cost="low",
-                reservation="maybe",
-                tags=["官方场馆", "粤博", "室内"],
-                transitEase=3, transferComplexity=3, timeMin=80,
-                intensity="low",
-                crowdRisk=3, checkin=1,
-                openHoursHint="以活动页为准（通常需预约入馆）",
-                notes="来自粤博活动列表页。",
-                link=href,
-                source="gdmuseum.com/col108"
-            ))
+            items.append({**tpl_list, "name": title, "link": href})
             if len(items) >= limit * 2:
                 break
     except Exception as e:
@@ -463,18 +722,32 @@ def parse_gdmuseum_activities(limit: int = 25) -> List[Dict[str, Any]]:
 
 
 # ---------- 4) 广州博物馆：展览 ----------
-def parse_gzmuseum_exhibitions(limit: int = 20) -> List[Dict[str, Any]]:
+async def parse_gzmuseum_exhibitions(session: aiohttp.ClientSession, limit: int = 20) -> List[Dict[str, Any]]:
     items: List[Dict[str, Any]] = []
+    tpl = make_item(
+        type="event",
+        area="广州博物馆（越秀/镇海楼等馆区）",
+        cost="low",
+        reservation="maybe",
+        tags=TAGS_GZMUSEUM,
+        transitEase=3, transferComplexity=3, timeMin=85,
+        intensity="low",
+        crowdRisk=3, checkin=1,
+        openHoursHint="以广州博物馆官网展览页面为准",
+        notes="官方展览信息（适合雨天/暴晒天）。",
+    )
     for url, source in [
         (GZMUSEUM_EXHIBITION_LIST, "guangzhoumuseum.cn/exhibition"),
         (GZMUSEUM_EXHIBITION_PRE, "guangzhoumuseum.cn/pre"),
     ]:
         try:
-            html = http_get(url)
-            soup = BeautifulSoup(html, "html.parser")
-            for a in soup.select("a"):
-                title = norm(a.get_text())
-                href = (a.get("href") or "").strip()
+            html = await http_get(session, url)
+            tree = LexborHTMLParser(html)
+            # 先试展览列表容器；站点改版导致选不到时再退回全页 <a>
+            anchors = tree.css(".exhibition-list a, .list a") or tree.css("a")
+            for a in anchors:
+                title = norm(a.text())
+                href = (a.attributes.get("href") or "").strip()
                 if not title:
                     continue
                 if len(title) < 6:
@@ -489,21 +762,7 @@ def parse_gzmuseum_exhibitions(limit: int = 20) -> List[Dict[str, Any]]:
                 if href and not href.startswith("http"):
                     href = ""
 
-                items.append(make_item(
-                    type="event",
-                    name=title,
-                    area="广州博物馆（越秀/镇海楼等馆区）",
-                    cost="low",
-                    reservation="maybe",
-                    tags=["官方场馆", "博物馆", "展览", "室内"],
-                    transitEase=3, transferComplexity=3, timeMin=85,
-                    intensity="low",
-                    crowdRisk=3, checkin=1,
-                    openHoursHint="以广州博物馆官网展览页面为准",
-                    notes="官方展览信息（适合雨天/暴晒天）。",
-                    link=href or url,
-                    source=source
-                ))
+                items.append({**tpl, "name": title, "link": href or url, "source": source})
                 if len(items) >= limit:
                     break
         except Exception as e:
@@ -511,41 +770,52 @@ def parse_gzmuseum_exhibitions(limit: int = 20) -> List[Dict[str, Any]]:
     return items
 
 
-def dedupe(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    seen = set()
-    out: List[Dict[str, Any]] = []
+def dedupe(items: Iterable[Dict[str, Any]], limit: int = 0) -> List[Dict[str, Any]]:
+    # 用 8 字节摘要当键：长中文标题不用整串进 set，内存占用恒定
+    uniq: Dict[bytes, Dict[str, Any]] = {}
     for it in items:
-        key = (it.get("name", ""), it.get("link", ""))
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(it)
-    return out
-
-
-def main() -> None:
+        key = hashlib.blake2b(
+            f"{it.get('name', '')}\0{it.get('link', '')}".encode("utf-8"),
+            digest_size=8,
+        ).digest()
+        uniq.setdefault(key, it)
+        # 凑够上限就收工，后面的连指纹都不用算
+        if limit and len(uniq) >= limit:
+            break
+    return list(uniq.values())
+
+
+async def main() -> None:
     items: List[Dict[str, Any]] = []
+    _memos_load()
+
+    # 单 host 连接也复用（豆瓣/文旅局各 40+ 个请求走同一批长连接，省掉重复 TLS 握手）
+    connector = aiohttp.TCPConnector(limit=20, limit_per_host=10,
+                                     keepalive_timeout=30, ttl_dns_cache=300)
+    # 每个 worker 都要整份吃下 PDF，最多开 4 个，防内存爆
+    pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 4))
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as session:
+        # 各信息源并发抓（内部还会再并发分页/PDF）
+        results = await asyncio.gather(
+            parse_wglj_schedule_index(session, pool, limit=25),
+            *[parse_douban_list(session, source_name, url, pages=8, page_step=10)
+              for source_name, url in DOUBAN_PAGES],
+            parse_gdmuseum_activities(session, limit=25),
+            parse_gzmuseum_exhibitions(session, limit=20),
+            return_exceptions=True,
+        )
+        for part in results:
+            # 单个信息源炸了不影响其它源出数据
+            if isinstance(part, BaseException):
+                print(f"[main] source failed: {part}")
+                continue
+            items.extend(part)
+    pool.shutdown()
+    _memos_save()
 
-    # 文旅局（入口页 + PDF解析条目）
-    items.extend(parse_wglj_schedule_index(limit=25))
-
-    # 豆瓣同城
-    for source_name, url in DOUBAN_PAGES:
-        items.extend(parse_douban_list(source_name, url, pages=8, page_step=10))
-
-    # 粤博
-    items.extend(parse_gdmuseum_activities(limit=25))
-
-    # 广州博物馆
-    items.extend(parse_gzmuseum_exhibitions(limit=20))
-
-    # 过滤 + 去重
-    items = [it for it in items if it.get("name") and not looks_bad(it["name"])]
-    items = dedupe(items)
-
-    # 防止过大
-    MAX_ITEMS = 260
-    items = items[:MAX_ITEMS]
+    # 空名过滤 + 去重 + 条数上限：一次遍历搞定（looks_bad 在各 parse_* 采集时已把过关）
+    MAX_ITEMS = 260  # 防止过大
+    items = dedupe((it for it in items if it.get("name")), limit=MAX_ITEMS)
 
     out = {
         "items": items,
@@ -558,11 +828,15 @@ def main() -> None:
         }
     }
 
-    with open("data.json", "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    # orjson 直接吐 UTF-8 字节（等价于 ensure_ascii=False），C 级序列化；
+    # 先写临时文件再 os.replace，读端（GitHub Pages 部署）永远不会看到半截文件
+    tmp = "data.json.tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(out, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, "data.json")
 
     print(f"Generated data.json with {len(items)} items.")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())